@@ -12,18 +12,93 @@ from pathlib import Path
 import logging
 import time
 import signal
+import threading
 import tempfile
 import shutil
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Let the CUDA caching allocator grow segments in place, so stems of different lengths
+# reuse the same memory from file to file instead of fragmenting it. Must be set before
+# torch is imported (audio-separator imports it lazily).
+os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True")
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+AUDIO_EXTENSIONS = {".mp3", ".flac", ".wav"}
+SEPARATION_BATCH_SIZE = 4  # Files per separate() call on GPU
+DEFAULT_CPU_JOBS = 2  # Worker processes when -j is not given; each loads its own copy of the models
+
+def _list_audio_files(input_path):
+    """List supported audio files in a directory with one scandir pass, matching extensions case-insensitively"""
+    with os.scandir(input_path) as it:
+        return sorted(Path(e.path) for e in it
+                      if e.is_file() and os.path.splitext(e.name)[1].lower() in AUDIO_EXTENSIONS)
+
+def _fast_copy(src, dst):
+    """Copy src to dst inside the kernel where possible, preserving metadata like shutil.copy2"""
+    # Opening dst for writing below would truncate src when both are the same file
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        raise shutil.SameFileError(f"{src!r} and {dst!r} are the same file")
+    if sys.platform == "darwin":
+        # APFS clonefile: the copy shares data blocks until either file is modified
+        if subprocess.run(["cp", "-c", "-p", str(src), str(dst)], capture_output=True).returncode == 0:
+            return
+    elif hasattr(os, "copy_file_range"):
+        # Reflinks on Btrfs/XFS, server-side copies on NFS, in-kernel copy elsewhere
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            if remaining == 0:
+                shutil.copystat(src, dst)
+                return
+        except OSError:
+            pass
+    # copyfile uses sendfile() on Linux and fcopyfile() on macOS
+    shutil.copyfile(src, dst)
+    shutil.copystat(src, dst)
+
+class PartialBatchError(Exception):
+    """Raised with the files of a batch that failed to separate, naming only those files"""
+    def __init__(self, failures):
+        self.failures = failures  # (Path, error message) pairs
+        super().__init__("; ".join(f"{path.name}: {error}" for path, error in failures))
+
+# Per-process KaraokeMaker used by batch worker processes
+_worker_maker = None
+
+def _init_worker(vocal_reduction, torch_threads):
+    """Build one KaraokeMaker per worker process so models load once per worker"""
+    global _worker_maker
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    _worker_maker = KaraokeMaker(vocal_reduction=vocal_reduction)
+
+def _worker(path, output_dir, method_name):
+    """Run a single-file KaraokeMaker method inside a worker process"""
+    return _worker_maker.run_one(method_name, path, output_dir)
+
+def _item_name(item):
+    """Display name for a file or a batch of files"""
+    return ", ".join(f.name for f in item) if isinstance(item, list) else item.name
+
 class KaraokeMaker:
-    def __init__(self, vocal_reduction=0.7):
+    def __init__(self, vocal_reduction=0.7, jobs=None, autocast=True):
         self.vocal_reduction = vocal_reduction  # 0.0 = no reduction, 1.0 = full removal
+        self.jobs = jobs  # None = one worker per CPU core
+        self.autocast = autocast  # Mixed-precision inference, only applied on GPU
         self.temp_dirs = []  # Track temporary directories for cleanup
         self.current_output_file = None
+        self._separator_lock = threading.Lock()  # Guards the separator cache
         self.setup_models()
         self.setup_signal_handlers()
         self.check_installation()
@@ -67,17 +142,31 @@ class KaraokeMaker:
     
     def setup_models(self):
         """Configure the models for different separation types"""
-        # Default model for instrumental separation
-        self.instrumental_model = "Demucs_v4_hybrid"
+        # Default model for instrumental separation. A two-stem model is needed for an
+        # Instrumental output; Demucs v4 (htdemucs) writes drums/bass/other/vocals instead.
+        self.instrumental_model = "BS_Roformer"
         # Model for vocal extraction
         self.vocal_model = "Kim_Vocal_2"
+        # audio-separator loads models by checkpoint filename
+        self.model_files = {
+            "BS_Roformer": "model_bs_roformer_ep_317_sdr_12.9755.ckpt",
+            "Kim_Vocal_2": "Kim_Vocal_2.onnx",
+        }
+        # Loaded separators keyed by (model, output dir), each with its own lock
+        self._separators = {}
     
     def check_installation(self):
         """Check if audio-separator is properly installed"""
         try:
             from audio_separator.separator import Separator
             logger.info("Using audio-separator for high-quality vocal removal")
-            self.separator = Separator()
+            self.separator_class = Separator
+            try:
+                from audio_separator.separator import BatchSeparationError
+                self.batch_error_class = BatchSeparationError
+            except ImportError:
+                # Before 0.47 a batch raises its first failure; an empty tuple catches nothing
+                self.batch_error_class = ()
             return True
         except ImportError as e:
             logger.error(f"audio-separator is required but not found: {e}")
@@ -85,6 +174,117 @@ class KaraokeMaker:
             logger.error("Or install with: pip install --break-system-packages audio-separator")
             sys.exit(1)
     
+    def _get_separator(self, model_name, output_dir):
+        """Return the separator for model_name, loading the model only on first use"""
+        key = (model_name, str(output_dir))
+        with self._separator_lock:
+            if key not in self._separators:
+                # FP16/BF16 autocast halves GPU bandwidth; it is slower than FP32 on CPU.
+                # use_soundfile writes stems through libsndfile instead of spawning ffmpeg per stem.
+                separator = self.separator_class(output_dir=str(output_dir), output_format="FLAC",
+                                                 use_autocast=self.autocast and self.uses_gpu(),
+                                                 use_soundfile=True)
+                
+                # Load the model
+                logger.info(f"Loading model: {model_name}")
+                separator.load_model(model_filename=self.model_files[model_name])
+                self._separators[key] = (separator, threading.Lock())
+            return self._separators[key]
+    
+    def _separate(self, model_name, input_file, output_dir):
+        """Separate input_file (or a list of files) with a cached model, returning the output file names"""
+        separator, lock = self._get_separator(model_name, output_dir)
+        audio = [str(f) for f in input_file] if isinstance(input_file, list) else str(input_file)
+        # A separator holds per-file state, so one call at a time per model
+        with lock:
+            return separator.separate(audio)
+    
+    def uses_gpu(self):
+        """Check if separation will run on CUDA or MPS"""
+        try:
+            import torch
+            return torch.cuda.is_available() or torch.backends.mps.is_available()
+        except ImportError:
+            return False
+    
+    def run_one(self, method_name, audio_file, output_dir):
+        """Run a single-file method, returning the error message instead of raising on failure"""
+        try:
+            getattr(self, method_name)(audio_file, output_dir)
+            return None
+        except PartialBatchError as e:
+            for path, error in e.failures:
+                logger.error(f"❌ Error processing {path.name}: {error}")
+            return e.failures
+        except Exception as e:
+            logger.error(f"❌ Error processing {_item_name(audio_file)}: {str(e)}")
+            return str(e)
+    
+    def run_batch(self, audio_files, method_name, output_dir, action="Processing", io_bound=False):
+        """Run a single-file method over audio_files, in parallel when more than one worker is available"""
+        total = len(audio_files)
+        if io_bound:
+            workers = self.jobs or os.cpu_count() or 1
+        elif self.uses_gpu():
+            # Every file queues on the same loaded model, so extra threads add no parallelism
+            # and only start separations that Ctrl-C cannot cancel
+            workers = 1
+        else:
+            workers = self.jobs or min(os.cpu_count() or 1, DEFAULT_CPU_JOBS)
+        workers = min(workers, total)
+        errors = []
+        
+        if workers <= 1:
+            for i, audio_file in enumerate(audio_files, 1):
+                try:
+                    logger.info(f"📁 {action} file {i}/{total}")
+                    errors.append(self.run_one(method_name, audio_file, output_dir))
+                except KeyboardInterrupt:
+                    logger.info(f"⏹️  Interrupted while {action.lower()} file {i}/{total}")
+                    logger.info(f"📊 Finished {i-1}/{total} files before interruption")
+                    raise
+            return self._report_failures(audio_files, errors)
+        
+        if io_bound:
+            # Copies wait on the disk, not the CPU, so threads are enough
+            logger.info(f"🧵 {action} {total} files with {workers} threads")
+            executor = ThreadPoolExecutor(max_workers=workers)
+            results = executor.map(self.run_one, [method_name] * total, audio_files, [output_dir] * total)
+        else:
+            torch_threads = max(1, (os.cpu_count() or 1) // workers)
+            logger.info(f"⚙️  {action} {total} files with {workers} worker processes")
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                           initargs=(self.vocal_reduction, torch_threads))
+            results = executor.map(_worker, audio_files, [output_dir] * total, [method_name] * total)
+        
+        try:
+            for error in results:
+                errors.append(error)
+                logger.info(f"📁 Finished file {len(errors)}/{total}")
+        except (KeyboardInterrupt, SystemExit):
+            logger.info(f"📊 Finished {len(errors)}/{total} files before interruption")
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
+        return self._report_failures(audio_files, errors)
+    
+    def _report_failures(self, audio_files, errors):
+        """Log a summary of the files that failed in a batch, returning how many failed"""
+        failures = []
+        for item, error in zip(audio_files, errors):
+            if isinstance(error, list):
+                failures.extend(error)  # (file, error) pairs from a partly failed batch
+            elif error:
+                failures.append((item, error))
+        if not failures:
+            return 0
+        count = lambda item: len(item) if isinstance(item, list) else 1
+        failed = sum(count(item) for item, _ in failures)
+        logger.warning(f"⚠️  {failed}/{sum(map(count, audio_files))} failed:")
+        for item, error in failures:
+            logger.warning(f"   - {_item_name(item)}: {error}")
+        return failed
+    
     def check_ffmpeg(self):
         """Check if ffmpeg is available"""
         try:
@@ -97,7 +297,7 @@ class KaraokeMaker:
             return False
     
     def process_instrumental(self, input_path, output_dir):
-        """Process file(s) to create instrumental versions"""
+        """Process file(s) to create instrumental versions, returning the number of files that failed"""
         input_path = Path(input_path)
         output_dir = Path(output_dir)
         output_dir.mkdir(exist_ok=True)
@@ -108,23 +308,20 @@ class KaraokeMaker:
                 self._process_single_instrumental(input_path, output_dir)
             elif input_path.is_dir():
                 # Process all audio files in directory
-                audio_files = list(input_path.glob("*.mp3")) + list(input_path.glob("*.flac")) + \
-                             list(input_path.glob("*.MP3")) + list(input_path.glob("*.FLAC")) + \
-                             list(input_path.glob("*.wav")) + list(input_path.glob("*.WAV"))
+                audio_files = _list_audio_files(input_path)
                 
                 if not audio_files:
                     logger.error(f"No audio files found in {input_path}")
                     return
                 
                 logger.info(f"Found {len(audio_files)} audio files to process")
-                for i, audio_file in enumerate(audio_files, 1):
-                    try:
-                        logger.info(f"📁 Processing file {i}/{len(audio_files)}")
-                        self._process_single_instrumental(audio_file, output_dir)
-                    except KeyboardInterrupt:
-                        logger.info(f"⏹️  Interrupted while processing {audio_file.name}")
-                        logger.info(f"📊 Processed {i-1}/{len(audio_files)} files before interruption")
-                        raise
+                if self.uses_gpu() and len(audio_files) > 1:
+                    # Hand the GPU several files per call so it isn't idle between files
+                    batches = [audio_files[i:i + SEPARATION_BATCH_SIZE]
+                               for i in range(0, len(audio_files), SEPARATION_BATCH_SIZE)]
+                    return self.run_batch(batches, "_process_instrumental_batch", output_dir, action="Processing batch")
+                else:
+                    return self.run_batch(audio_files, "_process_single_instrumental", output_dir, action="Processing")
             else:
                 logger.error(f"Input path does not exist: {input_path}")
         except KeyboardInterrupt:
@@ -137,18 +334,38 @@ class KaraokeMaker:
         self.current_output_file = None
         self._process_with_audio_separator(input_file, output_dir)
     
-    def _process_with_audio_separator(self, input_file, output_dir):
-        """Process using audio-separator for high quality"""
+    def _process_instrumental_batch(self, input_files, output_dir):
+        """Process several files with a single separate() call"""
+        if len(input_files) == 1:
+            self._process_single_instrumental(input_files[0], output_dir)
+            return
+        
+        logger.info(f"Processing batch: {', '.join(f.name for f in input_files)}")
         try:
-            # Configure separator for instrumental output
-            self.separator.model_name = self.instrumental_model
-            self.separator.output_dir = str(output_dir)
-            self.separator.output_format = "FLAC"
+            failures = []
+            try:
+                output_files = self._separate(self.instrumental_model, input_files, output_dir)
+            except self.batch_error_class as e:
+                # The other files in the batch were still separated in full
+                output_files = e.successful_files
+                failures = [(Path(path), str(error)) for path, error in e.failures]
             
-            # Load the model
-            logger.info(f"Loading model: {self.instrumental_model}")
-            self.separator.load_model()
+            instrumentals = [f for f in output_files if "Instrumental" in f]
+            for output_file in instrumentals:
+                logger.info(f"✅ Created instrumental: {output_file}")
+            expected = len(input_files) - len(failures)
+            if len(instrumentals) < expected:
+                logger.warning(f"Only {len(instrumentals)}/{expected} instrumental files found in batch output")
+            if failures:
+                raise PartialBatchError(failures)
             
+        except KeyboardInterrupt:
+            logger.info("⏹️  Processing interrupted by user")
+            raise
+    
+    def _process_with_audio_separator(self, input_file, output_dir):
+        """Process using audio-separator for high quality"""
+        try:
             # Apply vocal reduction if specified
             if self.vocal_reduction < 1.0:
                 # For partial reduction, we'll need to mix the instrumental back with original
@@ -156,7 +373,7 @@ class KaraokeMaker:
                 logger.info(f"Note: audio-separator performs full vocal removal. For partial reduction ({self.vocal_reduction:.0%}), consider post-processing.")
             
             # Separate the audio
-            output_files = self.separator.separate(str(input_file))
+            output_files = self._separate(self.instrumental_model, input_file, output_dir)
             
             # The instrumental file is typically named with "_Instrumental" suffix
             for output_file in output_files:
@@ -170,14 +387,11 @@ class KaraokeMaker:
         except KeyboardInterrupt:
             logger.info("⏹️  Processing interrupted by user")
             raise
-        except Exception as e:
-            logger.error(f"Error processing {input_file.name}: {str(e)}")
-            sys.exit(1)
         finally:
             self.current_output_file = None
     
     def process_reduced_vocals(self, input_path, output_dir):
-        """Process file(s) to create reduced vocals versions"""
+        """Process file(s) to create reduced vocals versions, returning the number of files that failed"""
         input_path = Path(input_path)
         output_dir = Path(output_dir)
         output_dir.mkdir(exist_ok=True)
@@ -188,23 +402,14 @@ class KaraokeMaker:
                 self._process_single_reduced_vocals(input_path, output_dir)
             elif input_path.is_dir():
                 # Process all audio files in directory
-                audio_files = list(input_path.glob("*.mp3")) + list(input_path.glob("*.flac")) + \
-                             list(input_path.glob("*.MP3")) + list(input_path.glob("*.FLAC")) + \
-                             list(input_path.glob("*.wav")) + list(input_path.glob("*.WAV"))
+                audio_files = _list_audio_files(input_path)
                 
                 if not audio_files:
                     logger.error(f"No audio files found in {input_path}")
                     return
                 
                 logger.info(f"Found {len(audio_files)} audio files to process")
-                for i, audio_file in enumerate(audio_files, 1):
-                    try:
-                        logger.info(f"📁 Processing file {i}/{len(audio_files)}")
-                        self._process_single_reduced_vocals(audio_file, output_dir)
-                    except KeyboardInterrupt:
-                        logger.info(f"⏹️  Interrupted while processing {audio_file.name}")
-                        logger.info(f"📊 Processed {i-1}/{len(audio_files)} files before interruption")
-                        raise
+                return self.run_batch(audio_files, "_process_single_reduced_vocals", output_dir, action="Processing")
             else:
                 logger.error(f"Input path does not exist: {input_path}")
         except KeyboardInterrupt:
@@ -219,16 +424,9 @@ class KaraokeMaker:
     def _process_reduced_vocals_with_audio_separator(self, input_file, output_dir):
         """Process reduced vocals using audio-separator"""
         try:
+            instrumental_file = None
             # First extract vocals
-            self.separator.model_name = self.vocal_model
-            self.separator.output_dir = str(output_dir)
-            self.separator.output_format = "FLAC"
-            
-            # Load the model
-            logger.info(f"Loading model: {self.vocal_model}")
-            self.separator.load_model()
-            
-            vocal_files = self.separator.separate(str(input_file))
+            vocal_files = self._separate(self.vocal_model, input_file, output_dir)
             
             # Find the vocal file
             vocal_file = None
@@ -245,26 +443,30 @@ class KaraokeMaker:
             # at a reduced volume. For now, we'll output the vocals separately
             logger.info(f"✅ Extracted vocals for reduced processing: {vocal_file}")
             
-            # Also create instrumental for mixing reference
-            self.separator.model_name = self.instrumental_model
-            logger.info(f"Loading model: {self.instrumental_model}")
-            self.separator.load_model()
-            instrumental_files = self.separator.separate(str(input_file))
-            
-            for file in instrumental_files:
+            # Two-stem vocal models write the instrumental from the same pass
+            for file in vocal_files:
                 if "Instrumental" in file:
-                    logger.info(f"✅ Created instrumental reference: {file}")
+                    instrumental_file = file
                     break
             
+            if not instrumental_file:
+                # Also create instrumental for mixing reference
+                instrumental_files = self._separate(self.instrumental_model, input_file, output_dir)
+                
+                for file in instrumental_files:
+                    if "Instrumental" in file:
+                        instrumental_file = file
+                        break
+            
+            if instrumental_file:
+                logger.info(f"✅ Created instrumental reference: {instrumental_file}")
+            
         except KeyboardInterrupt:
             logger.info("⏹️  Processing interrupted by user")
             raise
-        except Exception as e:
-            logger.error(f"Error processing {input_file.name}: {str(e)}")
-            sys.exit(1)
     
     def copy_original_audio(self, input_path, output_dir):
-        """Copy original audio files without processing when reduction is 0.0"""
+        """Copy original audio files unprocessed (reduction 0.0), returning the number that failed"""
         input_path = Path(input_path)
         output_dir = Path(output_dir)
         output_dir.mkdir(exist_ok=True)
@@ -275,23 +477,14 @@ class KaraokeMaker:
                 self._copy_single_file(input_path, output_dir)
             elif input_path.is_dir():
                 # Copy all audio files in directory
-                audio_files = list(input_path.glob("*.mp3")) + list(input_path.glob("*.flac")) + \
-                             list(input_path.glob("*.MP3")) + list(input_path.glob("*.FLAC")) + \
-                             list(input_path.glob("*.wav")) + list(input_path.glob("*.WAV"))
+                audio_files = _list_audio_files(input_path)
                 
                 if not audio_files:
                     logger.error(f"No audio files found in {input_path}")
                     return
                 
                 logger.info(f"Found {len(audio_files)} audio files to copy")
-                for i, audio_file in enumerate(audio_files, 1):
-                    try:
-                        logger.info(f"📁 Copying file {i}/{len(audio_files)}")
-                        self._copy_single_file(audio_file, output_dir)
-                    except KeyboardInterrupt:
-                        logger.info(f"⏹️  Interrupted while copying {audio_file.name}")
-                        logger.info(f"📊 Copied {i-1}/{len(audio_files)} files before interruption")
-                        raise
+                return self.run_batch(audio_files, "_copy_single_file", output_dir, action="Copying", io_bound=True)
             else:
                 logger.error(f"Input path does not exist: {input_path}")
         except KeyboardInterrupt:
@@ -300,14 +493,9 @@ class KaraokeMaker:
     
     def _copy_single_file(self, input_file, output_dir):
         """Copy a single file to the output directory"""
-        try:
-            import shutil
-            output_file = output_dir / input_file.name
-            shutil.copy2(input_file, output_file)
-            logger.info(f"✅ Copied: {input_file.name}")
-        except Exception as e:
-            logger.error(f"Error copying {input_file.name}: {str(e)}")
-            sys.exit(1)
+        output_file = output_dir / input_file.name
+        _fast_copy(input_file, output_file)
+        logger.info(f"✅ Copied: {input_file.name}")
 
 def main():
     parser = argparse.ArgumentParser(
@@ -351,6 +539,14 @@ create both vocal and instrumental tracks for post-processing/mixing.
                             "Note: audio-separator performs full separation. "
                             "For partial reduction, consider post-processing the outputs.")
     
+    parser.add_argument("--no-autocast", dest="autocast", action="store_false",
+                       help="Run GPU separation in full FP32 precision instead of mixed precision")
+    
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                       help="Number of files to process in parallel when the input is a directory "
+                            f"(default: {DEFAULT_CPU_JOBS}, since each worker process loads its own "
+                            "copy of the models; GPU separation always runs one file at a time)")
+    
     args = parser.parse_args()
     
     # Validate reduction level
@@ -358,25 +554,34 @@ create both vocal and instrumental tracks for post-processing/mixing.
         logger.error("Reduction level must be between 0.0 and 1.0")
         sys.exit(1)
     
+    if args.jobs is not None and args.jobs < 1:
+        logger.error("Jobs must be at least 1")
+        sys.exit(1)
+    
     # Create karaoke maker instance with specified reduction level
-    karaoke_maker = KaraokeMaker(vocal_reduction=args.reduction)
+    karaoke_maker = KaraokeMaker(vocal_reduction=args.reduction, jobs=args.jobs, autocast=args.autocast)
     
     try:
         # Process based on reduction level
         if args.reduction >= 0.9:
             logger.info(f"🎵 Creating instrumental tracks (reduction: {args.reduction:.0%})...")
-            karaoke_maker.process_instrumental(args.input, args.output)
-            logger.info("✅ Instrumental processing completed!")
+            failed = karaoke_maker.process_instrumental(args.input, args.output)
+            done = "Instrumental processing"
         elif args.reduction > 0.0:
             logger.info(f"🎤 Creating reduced vocals tracks (reduction: {args.reduction:.0%})...")
-            karaoke_maker.process_reduced_vocals(args.input, args.output)
-            logger.info("✅ Reduced vocals processing completed!")
+            failed = karaoke_maker.process_reduced_vocals(args.input, args.output)
+            done = "Reduced vocals processing"
         else:
             logger.info(f"🎶 Copying original audio files (no reduction: {args.reduction:.0%})...")
-            karaoke_maker.copy_original_audio(args.input, args.output)
-            logger.info("✅ Audio copying completed!")
+            failed = karaoke_maker.copy_original_audio(args.input, args.output)
+            done = "Audio copying"
         
         logger.info(f"📁 Output saved to: {args.output}")
+        if failed:
+            # A non-zero exit lets scripts and CI notice a partly failed batch
+            logger.error(f"❌ {done} finished with {failed} failed file(s)")
+            sys.exit(1)
+        logger.info(f"✅ {done} completed!")
         
     except KeyboardInterrupt:
         logger.info("\n🛑 Processing interrupted by user")
@@ -1,13 +1,22 @@
 # Filename: main.py
 import os
+import io
 import logging
 import json
 import difflib
+import fcntl
+import glob
+import math
 import re
 import sys
 import time
 import random
+import threading
 import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 
 # --- LOGGING SETUP ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -23,10 +32,40 @@ except ImportError:
     JELLYFISH_AVAILABLE = False
     print("⚠️  'jellyfish' NOT found. Using basic matching. (pip install jellyfish)")
 
+try:
+    from rapidfuzz.distance import JaroWinkler, Levenshtein
+    from rapidfuzz.process import cpdist
+    RAPIDFUZZ_AVAILABLE = True
+    print("✅ 'rapidfuzz' library loaded (Fast word alignment enabled)")
+except ImportError:
+    RAPIDFUZZ_AVAILABLE = False
+    print("⚠️  'rapidfuzz' NOT found. Using difflib alignment. (pip install rapidfuzz)")
+
+FUZZY_AVAILABLE = RAPIDFUZZ_AVAILABLE or JELLYFISH_AVAILABLE
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+    print("✅ 'orjson' library loaded (Fast JSON enabled)")
+except ImportError:
+    ORJSON_AVAILABLE = False
+    print("⚠️  'orjson' NOT found. Using stdlib json. (pip install orjson)")
+
+try:
+    from flask_compress import Compress
+    COMPRESS_AVAILABLE = True
+    print("✅ 'flask-compress' library loaded (Response compression enabled)")
+except ImportError:
+    COMPRESS_AVAILABLE = False
+    print("⚠️  'flask-compress' NOT found. Responses sent uncompressed. (pip install flask-compress)")
+
 try:
     import google.auth
     from google.cloud.speech_v2 import SpeechClient
-    from google.cloud.speech_v2.types import RecognitionConfig, RecognizeRequest, RecognitionFeatures
+    from google.cloud.speech_v2.types import (
+        RecognitionConfig, RecognizeRequest, RecognitionFeatures,
+        StreamingRecognitionConfig, StreamingRecognizeRequest,
+    )
     GCP_AVAILABLE = True
     print("✅ Google Cloud libraries loaded")
 except ImportError:
@@ -34,9 +73,27 @@ except ImportError:
     print("❌ Google Cloud libraries NOT found. (pip install google-cloud-speech)")
 
 from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 
 app = Flask(__name__)
 
+if ORJSON_AVAILABLE:
+    # jsonify and request.json go through orjson; /transcribe replies carry the full comparison HTML
+    class ORJSONProvider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = ORJSONProvider(app)
+
+if COMPRESS_AVAILABLE:
+    # The comparison HTML repeats the same span classes and compresses very well.
+    # Audio is already compressed and is left out.
+    app.config['COMPRESS_MIMETYPES'] = ['application/json', 'text/html']
+    Compress(app)
+
 # --- CONFIGURATION ---
 LOCATION = "us" 
 API_ENDPOINT = f"{LOCATION}-speech.googleapis.com"
@@ -44,6 +101,21 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 SONGS_DIR = os.path.join(BASE_DIR, 'songs-karaoke')
 SONGS_DB_PATH = os.path.join(BASE_DIR, 'songs.json')
 LEADERBOARD_PATH = os.path.join(BASE_DIR, 'leaderboard.json')
+LEADERBOARD_LOG_PATH = os.path.join(BASE_DIR, 'leaderboard.jsonl')
+LEADERBOARD_LOCK_PATH = os.path.join(BASE_DIR, 'leaderboard.lock')
+LEADERBOARD_SIZE = 50
+LEADERBOARD_COMPACT_AT = 256  # Logged entries before they are folded into leaderboard.json
+
+# Multipart uploads larger than this are streamed to Speech-to-Text instead of read into
+# memory. Raw audio/* bodies are always streamed, straight from the socket.
+STREAMING_THRESHOLD = 1024 * 1024
+STREAM_CHUNK_SIZE = io.DEFAULT_BUFFER_SIZE
+
+# Scores are computed after the transcript is returned and polled for by job id.
+# Results live on disk so whichever gunicorn worker takes the poll can answer it.
+SCORE_JOBS_DIR = os.path.join(BASE_DIR, '.score-jobs')  # Not /tmp, where another user could pre-create it
+SCORE_JOB_TTL = 600  # Seconds before finished or abandoned jobs are pruned
+SCORE_WORKERS = 2
 
 # Auto-detect Project ID
 PROJECT_ID = os.environ.get("GOOGLE_CLOUD_PROJECT")
@@ -54,6 +126,23 @@ if not PROJECT_ID and GCP_AVAILABLE:
         print(f"⚠️  Auth Error: {e}")
 
 print(f"ℹ️  Project ID: {PROJECT_ID if PROJECT_ID else 'NOT SET (Check GOOGLE_CLOUD_PROJECT)'}")
+
+# Warm the Speech-to-Text channel (DNS, TLS, OAuth token) at startup instead of on the
+# first singer's request. gunicorn workers each import this module, so each gets its own.
+SPEECH_CLIENT = None
+if GCP_AVAILABLE and PROJECT_ID:
+    try:
+        import grpc
+        from google.auth.transport.requests import Request as AuthRequest
+        # Fetch the token and connect without calling a Speech method, so nothing beyond
+        # the roles/speech.client grant from setup_iam.sh is needed
+        credentials, _ = google.auth.default(scopes=["https://www.googleapis.com/auth/cloud-platform"])
+        credentials.refresh(AuthRequest())
+        SPEECH_CLIENT = SpeechClient(credentials=credentials, client_options={"api_endpoint": API_ENDPOINT})
+        grpc.channel_ready_future(SPEECH_CLIENT.transport.grpc_channel).result(timeout=5)
+        print("✅ Speech-to-Text channel ready")
+    except Exception as e:
+        print(f"⚠️  Speech-to-Text warm-up failed ({e!r}). Harmless: the first request connects instead.")
 print("----------------------\n")
 
 # Ensure templates directory exists
@@ -65,106 +154,324 @@ if not os.path.exists(TEMPLATE_DIR):
 def load_json(path, default=None):
     if not os.path.exists(path): return default if default is not None else {}
     try:
-        with open(path, 'r', encoding='utf-8') as f: return json.load(f)
+        with open(path, 'rb') as f: return orjson.loads(f.read()) if ORJSON_AVAILABLE else json.load(f)
     except: return default if default is not None else {}
 
 def save_json(path, data):
+    if ORJSON_AVAILABLE:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        return
     with open(path, 'w', encoding='utf-8') as f:
         json.dump(data, f, indent=2)
 
+def file_stamp(path):
+    # Size as well as mtime: a rewrite within one timestamp tick still busts the cache
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except OSError: return None
+
+# Parsed JSON is cached per file stamp, so an edit on disk busts the cache
+@lru_cache(maxsize=1)
+def _load_songs_db(stamp):
+    return load_json(SONGS_DB_PATH)
+
+def songs_db():
+    return _load_songs_db(file_stamp(SONGS_DB_PATH))
+
+def load_jsonl(path):
+    if not os.path.exists(path): return []
+    entries = []
+    loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+    with open(path, 'rb') as f:
+        for line in f:
+            try: entries.append(loads(line))
+            except ValueError: pass  # Torn line from an interrupted append
+    return entries
+
+def append_jsonl(path, entry):
+    line = orjson.dumps(entry) if ORJSON_AVAILABLE else json.dumps(entry).encode('utf-8')
+    with open(path, 'ab') as f:
+        f.write(line + b"\n")
+
+def valid_leaderboard_entry(entry):
+    # Logged entries are only sorted later, so a bad score must be rejected before it is persisted
+    if not isinstance(entry, dict) or 'name' not in entry: return False
+    score = entry.get('score')
+    return isinstance(score, (int, float)) and not isinstance(score, bool) and math.isfinite(score)
+
+def top_scores(entries):
+    return sorted(entries, key=lambda x: x['score'], reverse=True)[:LEADERBOARD_SIZE]
+
+# The leaderboard is leaderboard.json plus the append-only leaderboard.jsonl log
+@lru_cache(maxsize=1)
+def _load_leaderboard(base_stamp, log_stamp):
+    base = load_json(LEADERBOARD_PATH, default=[])
+    log = load_jsonl(LEADERBOARD_LOG_PATH)
+    return (top_scores(base + log) if log else base), len(log)
+
+def leaderboard_db():
+    data, log_size = _load_leaderboard(file_stamp(LEADERBOARD_PATH), file_stamp(LEADERBOARD_LOG_PATH))
+    if log_size > LEADERBOARD_COMPACT_AT and not LEADERBOARD_LOCK.locked():
+        threading.Thread(target=compact_leaderboard, daemon=True).start()
+    return data
+
+@contextmanager
+def leaderboard_file_lock():
+    """Exclusive lock shared by every worker process, released when the file closes"""
+    with open(LEADERBOARD_LOCK_PATH, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+def compact_leaderboard():
+    """Fold the log into leaderboard.json, replacing both files atomically"""
+    with LEADERBOARD_LOCK, leaderboard_file_lock():
+        pid = os.getpid()
+        staged = f'{LEADERBOARD_LOG_PATH}.{pid}.compacting'
+        try: os.replace(LEADERBOARD_LOG_PATH, staged)  # New POSTs start a fresh log
+        except FileNotFoundError: pass
+        # Also picks up logs left behind by a worker that died mid-compaction
+        pending = glob.glob(glob.escape(LEADERBOARD_LOG_PATH) + '.*.compacting')
+        if not pending: return
+        data = top_scores(load_json(LEADERBOARD_PATH, default=[]) + [e for path in pending for e in load_jsonl(path)])
+        tmp = f'{LEADERBOARD_PATH}.{pid}.tmp'
+        save_json(tmp, data)
+        os.replace(tmp, LEADERBOARD_PATH)
+        for path in pending: os.remove(path)
+        _load_leaderboard.cache_clear()
+
+LEADERBOARD_LOCK = threading.Lock()
+
 # --- SCORING ENGINE ---
+_PUNCT_RE = re.compile(r'[^\w\s]')
+_PUNCT_TABLE = str.maketrans('', '', ''.join(ch for ch in map(chr, range(128)) if _PUNCT_RE.match(ch)))
+_REPLACEMENTS = {
+    "gonna": "going to", "wanna": "want to", "cause": "because",
+    "cos": "because", "em": "them", "im": "i am", "youre": "you are",
+    "cant": "cannot", "dont": "do not", "wont": "will not"
+}
+
+_REPLACEMENTS_RE = re.compile(r'\b(' + '|'.join(map(re.escape, _REPLACEMENTS)) + r')\b')
+
 def normalize_text(text):
     t = text.lower()
-    t = re.sub(r'[^\w\s]', '', t)
-    replacements = {
-        "gonna": "going to", "wanna": "want to", "cause": "because",
-        "cos": "because", "em": "them", "im": "i am", "youre": "you are",
-        "cant": "cannot", "dont": "do not", "wont": "will not"
-    }
-    return [replacements.get(w, w) for w in t.split()]
+    # translate is a plain C loop and ~10x quicker than the regex, but only on ASCII input
+    t = t.translate(_PUNCT_TABLE) if t.isascii() else _PUNCT_RE.sub('', t)
+    return _REPLACEMENTS_RE.sub(lambda m: _REPLACEMENTS[m.group(1)], t).split()
+
+# Lyrics only change with songs.json, so each song's tokens are normalized once.
+# Interning lets repeated lyric words share one object and compare by identity.
+@lru_cache(maxsize=256)
+def target_tokens(official_text):
+    return tuple(sys.intern(w) for w in normalize_text(official_text))
+
+# Comparison HTML templates for each word verdict; runs are rendered with map(_X.__mod__, ...)
+_GREEN = "<span class='text-green-400 font-bold'>%s</span>"
+_YELLOW = "<span class='text-yellow-400 font-bold'>%s</span>"
+_RED = "<span class='text-red-500 line-through opacity-50'>%s</span>"
+_RED_XS = "<span class='text-red-500 text-xs opacity-50'>%s</span>"
+
+def word_similarity(u_word, t_word):
+    if u_word == t_word: return 1.0
+    if RAPIDFUZZ_AVAILABLE: return JaroWinkler.similarity(u_word, t_word)
+    return jellyfish.jaro_winkler_similarity(u_word, t_word)
+
+def pair_similarities(user_pairs, target_pairs):
+    """Similarity of each (user_pairs[i], target_pairs[i]) word pair"""
+    if RAPIDFUZZ_AVAILABLE and user_pairs:
+        # Element-wise in one C call (the diagonal of a cdist, without the off-diagonal work)
+        return cpdist(user_pairs, target_pairs, scorer=JaroWinkler.normalized_similarity,
+                      workers=1, dtype='float64').tolist()
+    return [word_similarity(u, t) for u, t in zip(user_pairs, target_pairs)]
+
+def align_words(user_words, target_words):
+    # Levenshtein keeps substitutions as 'replace' blocks, which the fuzzy branch relies on
+    if RAPIDFUZZ_AVAILABLE: return Levenshtein.opcodes(user_words, target_words).as_list()
+    # autojunk would discard common words like "the" once the lyrics pass 200 words
+    return difflib.SequenceMatcher(None, user_words, target_words, autojunk=False).get_opcodes()
 
 def calculate_score_advanced(user_text, official_text):
     print("\n📊 --- SCORING CALCULATION ---")
     user_words = normalize_text(user_text)
-    target_words = normalize_text(official_text)
+    target_words = target_tokens(official_text)
     
     print(f"🗣️  User Words ({len(user_words)}): {user_words}")
     print(f"📄 Target Words ({len(target_words)}): {target_words[:10]}...") # Truncate for log
 
     if not target_words: return 0, user_text
     
-    matcher = difflib.SequenceMatcher(None, user_words, target_words)
+    # A perfect take needs no alignment or fuzzy matching
+    if tuple(user_words) == target_words:
+        print("📈 Final Score: 100% (exact match)")
+        return 100, " ".join(map(_GREEN.__mod__, user_words))
+    
     html_output = []
     weighted_score = 0.0
     total_possible = len(target_words)
     
-    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+    opcodes = align_words(user_words, target_words)
+    
+    # Score the positionally paired words of every replace block in one batched call
+    user_pairs, target_pairs = [], []
+    if FUZZY_AVAILABLE:
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == 'replace':
+                n = min(i2 - i1, j2 - j1)
+                user_pairs.extend(user_words[i1:i1 + n])
+                target_pairs.extend(target_words[j1:j1 + n])
+    sims = pair_similarities(user_pairs, target_pairs)
+    sim_pos = 0
+    
+    for tag, i1, i2, j1, j2 in opcodes:
         if tag == 'equal':
-            for w in user_words[i1:i2]:
-                html_output.append(f"<span class='text-green-400 font-bold'>{w}</span>")
-                weighted_score += 1.0
+            html_output.extend(map(_GREEN.__mod__, user_words[i1:i2]))
+            weighted_score += i2 - i1
         elif tag == 'replace':
             user_segment = user_words[i1:i2]
             target_segment = target_words[j1:j2]
+            paired = min(len(user_segment), len(target_segment)) if FUZZY_AVAILABLE else 0
             for idx in range(max(len(user_segment), len(target_segment))):
                 u_word = user_segment[idx] if idx < len(user_segment) else ""
-                t_word = target_segment[idx] if idx < len(target_segment) else ""
                 
                 match_found = False
-                if u_word and t_word and JELLYFISH_AVAILABLE:
-                    sim = jellyfish.jaro_winkler_similarity(u_word, t_word)
+                if idx < paired:
+                    sim = sims[sim_pos + idx]
                     if sim > 0.85:
-                        html_output.append(f"<span class='text-green-400 font-bold'>{u_word}</span>")
+                        html_output.append(_GREEN % u_word)
                         weighted_score += 1.0
                         match_found = True
                     elif sim > 0.70:
-                        html_output.append(f"<span class='text-yellow-400 font-bold'>{u_word}</span>")
+                        html_output.append(_YELLOW % u_word)
                         weighted_score += 0.8
                         match_found = True
                 
                 if not match_found and u_word:
-                    html_output.append(f"<span class='text-red-500 line-through opacity-50'>{u_word}</span>")
+                    html_output.append(_RED % u_word)
+            sim_pos += paired
         elif tag == 'insert':
              pass 
         elif tag == 'delete':
-            for w in user_words[i1:i2]:
-                html_output.append(f"<span class='text-red-500 text-xs opacity-50'>{w}</span>")
+            html_output.extend(map(_RED_XS.__mod__, user_words[i1:i2]))
 
     final_score = int((weighted_score / total_possible) * 100) if total_possible > 0 else 0
     print(f"📈 Final Score: {final_score}%")
     return min(100, final_score), " ".join(html_output)
 
+# --- SPEECH HELPERS ---
+# Client init resolves credentials and opens a gRPC channel, so build it once per process
+SPEECH_CLIENT_LOCK = threading.Lock()
+
+def get_speech_client():
+    global SPEECH_CLIENT
+    if SPEECH_CLIENT is None:
+        # gthread workers share the module; only one of them should open the channel
+        with SPEECH_CLIENT_LOCK:
+            if SPEECH_CLIENT is None:
+                SPEECH_CLIENT = SpeechClient(client_options={"api_endpoint": API_ENDPOINT})
+    return SPEECH_CLIENT
+
+def recognize_content(client, recognizer, config, content):
+    request_obj = RecognizeRequest(
+        recognizer=recognizer,
+        config=config,
+        content=content,
+    )
+    response = client.recognize(request=request_obj)
+    return [r.alternatives[0].transcript for r in response.results if r.alternatives]
+
+def recognize_stream(client, recognizer, config, stream):
+    """Feed an upload stream to streaming_recognize in small chunks without buffering it"""
+    sent = 0
+    def requests_gen():
+        nonlocal sent
+        yield StreamingRecognizeRequest(
+            recognizer=recognizer,
+            streaming_config=StreamingRecognitionConfig(config=config),
+        )
+        while True:
+            chunk = stream.read(STREAM_CHUNK_SIZE)
+            if not chunk: break
+            sent += len(chunk)
+            yield StreamingRecognizeRequest(audio=chunk)
+
+    transcript_parts = []
+    for response in client.streaming_recognize(requests=requests_gen()):
+        for r in response.results:
+            if r.is_final and r.alternatives:
+                transcript_parts.append(r.alternatives[0].transcript)
+    print(f"📦 Streamed Audio Size: {sent} bytes")
+    return transcript_parts
+
+# --- SCORE JOBS ---
+SCORE_EXECUTOR = ThreadPoolExecutor(max_workers=SCORE_WORKERS, thread_name_prefix='score')
+_SCORE_JOB_RE = re.compile(r'[0-9a-f]{32}')
+
+def score_job_path(job_id, suffix='.json'):
+    return os.path.join(SCORE_JOBS_DIR, job_id + suffix)
+
+def submit_score_job(transcript, target_lyrics):
+    os.makedirs(SCORE_JOBS_DIR, mode=0o700, exist_ok=True)
+    job_id = uuid.uuid4().hex
+    # The marker lets other workers tell a running job from an unknown one
+    open(score_job_path(job_id, '.pending'), 'wb').close()
+    SCORE_EXECUTOR.submit(run_score_job, job_id, transcript, target_lyrics)
+    return job_id
+
+def run_score_job(job_id, transcript, target_lyrics):
+    try:
+        score, comparison = calculate_score_advanced(transcript, target_lyrics)
+        result = {'score': score, 'comparison': comparison}
+    except Exception as e:
+        print("❌ ERROR during scoring:")
+        traceback.print_exc()
+        result = {'error': str(e)}
+    tmp = score_job_path(job_id, '.tmp')
+    save_json(tmp, result)
+    os.replace(tmp, score_job_path(job_id))  # Pollers never see a partial result
+    try: os.remove(score_job_path(job_id, '.pending'))
+    except FileNotFoundError: pass
+    prune_score_jobs()
+
+def prune_score_jobs():
+    cutoff = time.time() - SCORE_JOB_TTL
+    with os.scandir(SCORE_JOBS_DIR) as entries:
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff: os.remove(entry.path)
+            except OSError: pass
+
 # --- ROUTES ---
 @app.route('/songs/<path:filename>')
 def serve_audio(filename):
     return send_from_directory(SONGS_DIR, filename)
 
+# start_offset is computed by setup_music.py, so the song list is a pure view of songs.json
+@lru_cache(maxsize=1)
+def _song_list(stamp):
+    return [{
+        "id": key,
+        "title": data.get('title', 'Unknown'),
+        "filename": data.get('filename', ''),
+        "lyrics_map": data.get('lyrics_map', []),
+        "start_offset": data.get('start_offset', 0)
+    } for key, data in _load_songs_db(stamp).items()]
+
 @app.route('/')
 def index():
-    songs_db = load_json(SONGS_DB_PATH)
-    songs_list = []
-    for key, data in songs_db.items():
-        songs_list.append({
-            "id": key,
-            "title": data.get('title', 'Unknown'),
-            "filename": data.get('filename', ''),
-            "lyrics_map": data.get('lyrics_map', []),
-            "start_offset": data.get('start_offset', 0)
-        })
-    return render_template('index.html', songs=songs_list)
+    return render_template('index.html', songs=_song_list(file_stamp(SONGS_DB_PATH)))
 
 @app.route('/leaderboard', methods=['GET', 'POST'])
 def leaderboard():
-    data = load_json(LEADERBOARD_PATH, default=[])
     if request.method == 'POST':
         entry = request.json
-        if not entry or 'name' not in entry: return jsonify({'error': 'Invalid'}), 400
-        data.append(entry)
-        data.sort(key=lambda x: x['score'], reverse=True)
-        data = data[:50]
-        save_json(LEADERBOARD_PATH, data)
+        if not valid_leaderboard_entry(entry): return jsonify({'error': 'Invalid'}), 400
+        with leaderboard_file_lock():  # Keeps the append out of a log another worker is compacting
+            append_jsonl(LEADERBOARD_LOG_PATH, entry)
+            # mtime granularity can be coarser than back-to-back writes
+            _load_leaderboard.cache_clear()
         return jsonify({'status': 'saved'})
-    return jsonify(data)
+    return jsonify(leaderboard_db())
 
 @app.route('/transcribe', methods=['POST'])
 def transcribe():
@@ -178,72 +485,88 @@ def transcribe():
         print("❌ FAILURE: No Project ID found.")
         return jsonify({'error': 'Server Config Error: No Project ID'}), 500
 
-    audio_file = request.files.get('audio_data')
-    song_id = request.form.get('song_id')
+    # Raw audio bodies are read off the socket as they arrive; multipart needs a full parse first
+    raw_upload = request.mimetype.startswith('audio/')
+    if raw_upload:
+        audio_stream = request.stream if request.content_length else None
+        song_id = request.args.get('song_id')
+    else:
+        audio_file = request.files.get('audio_data')
+        audio_stream = audio_file.stream if audio_file else None
+        song_id = request.form.get('song_id')
     
-    if not audio_file: 
+    if not audio_stream: 
         print("❌ FAILURE: No audio file received.")
         return jsonify({'error': 'No audio'}), 400
     
-    content = audio_file.read()
-    print(f"📦 Received Audio Size: {len(content)} bytes")
     print(f"🎵 Song ID: {song_id}")
 
+    # --- LYRICS LOOKUP (before paying for the upload read and the GCP call) ---
+    songs = songs_db()
+    if not song_id or song_id not in songs:
+        print(f"❌ ERROR: Song ID {song_id} not found in database.")
+        return jsonify({'error': 'Unknown song'}), 400
+    target_lyrics = songs[song_id].get('lyrics', '')
+    if not target_lyrics:
+        print("⚠️  WARNING: No lyrics found in database for this song!")
+        return jsonify({'error': 'No lyrics for song'}), 400
+
+    upload_size = request.content_length or 0
+    use_streaming = raw_upload or upload_size > STREAMING_THRESHOLD
+    if not use_streaming:
+        content = audio_stream.read()
+        print(f"📦 Received Audio Size: {len(content)} bytes")
+
     try:
         print(f"📡 Connecting to Speech-to-Text (Project: {PROJECT_ID})...")
-        client = SpeechClient(client_options={"api_endpoint": API_ENDPOINT})
+        client = get_speech_client()
         
         parent = f"projects/{PROJECT_ID}/locations/{LOCATION}"
+        recognizer = f"{parent}/recognizers/_"
         config = RecognitionConfig(
             auto_decoding_config={},
             language_codes=["en-US"],
             model="chirp_3", 
             features=RecognitionFeatures(enable_automatic_punctuation=True),
         )
-        request_obj = RecognizeRequest(
-            recognizer=f"{parent}/recognizers/_", 
-            config=config,
-            content=content,
-        )
 
         print("⏳ Waiting for GCP response...")
-        response = client.recognize(request=request_obj)
+        if use_streaming:
+            print(f"🌊 Streaming upload (~{upload_size} bytes) to GCP...")
+            transcript_parts = recognize_stream(client, recognizer, config, audio_stream)
+        else:
+            transcript_parts = recognize_content(client, recognizer, config, content)
         
         # --- DEBUG RAW RESPONSE ---
-        if not response.results:
+        if not transcript_parts:
             print("⚠️  GCP Response contained NO results (Empty Transcript)")
             full_transcript = ""
         else:
-            transcript_parts = [r.alternatives[0].transcript for r in response.results if r.alternatives]
             full_transcript = " ".join(transcript_parts)
             print(f"📝 FULL TRANSCRIPT: '{full_transcript}'")
         
-        score = 0
-        comparison = ""
-        
-        # --- LYRICS LOOKUP ---
-        songs_db = load_json(SONGS_DB_PATH)
-        if song_id and song_id in songs_db:
-            target_lyrics = songs_db[song_id].get('lyrics', '')
-            if not target_lyrics:
-                print("⚠️  WARNING: No lyrics found in database for this song!")
-            else:
-                score, comparison = calculate_score_advanced(full_transcript, target_lyrics)
-        else:
-            print(f"❌ ERROR: Song ID {song_id} not found in database.")
-
+        # Reply with the transcript now; the client polls /transcribe/score/<id> for the score
         return jsonify({
             'transcript': full_transcript,
-            'score': score,
-            'comparison': comparison
+            'score_job_id': submit_score_job(full_transcript, target_lyrics)
         })
     except Exception as e:
         print("❌ FATAL ERROR during transcription:")
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/transcribe/score/<job_id>')
+def transcribe_score(job_id):
+    if not _SCORE_JOB_RE.fullmatch(job_id): return jsonify({'error': 'Unknown job'}), 404
+    if os.path.exists(score_job_path(job_id)):
+        result = load_json(score_job_path(job_id))
+        return jsonify(result), 500 if 'error' in result else 200
+    if os.path.exists(score_job_path(job_id, '.pending')):
+        return jsonify({'status': 'pending'}), 202
+    return jsonify({'error': 'Unknown job'}), 404
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8080))
     print(f"🚀 Server running on http://localhost:{port}")
-    app.run(debug=True, host='0.0.0.0', port=port)
+    app.run(debug=False, host='0.0.0.0', port=port)
 
@@ -2,39 +2,66 @@
 # /// script
 # requires-python = "==3.13"
 # dependencies = [
-#     "flask==3.0.0",
-#     "google-cloud-speech==2.26.0",
 #     "requests",
+#     "orjson",
+#     "httpx[http2]",
 #     "beautifulsoup4",
-#     "jellyfish",
 #     "mutagen",
-#     "audio-separator>=0.39.0",
-#     "torch>=2.3.0",
-#     "torchaudio>=2.3.0",
-#     "onnxruntime>=1.23.0",
+#     "numpy",
+#     "numba",
 # ]
 # ///
 
 import sys
 import os
+import functools
+import importlib.util
+import sqlite3
+import mmap
+if sys.platform.startswith('linux'): import fcntl
 import json
 import requests
 import re
+import shutil
 import urllib.parse
 import html as html_entity
-from bs4 import BeautifulSoup
 import time
 import argparse
-import glob
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import numpy as np
+import orjson
+# numba, httpx (with asyncio) and bs4 are imported where they are used: numba alone costs ~200ms at startup,
+# which --help and runs that never build a lyrics map or hit Bandcamp shouldn't pay
+NUMBA_AVAILABLE = importlib.util.find_spec('numba') is not None
+# httpx only negotiates HTTP/2 when h2 is installed
+HTTPX_AVAILABLE = all(importlib.util.find_spec(m) is not None for m in ('httpx', 'h2'))
 from mutagen.mp3 import MP3
-from mutagen.oggvorbis import OggVorbis
-from mutagen.flac import FLAC
+from mutagen.id3 import ID3, ID3NoHeaderError
 from mutagen import File as MutagenFile
 
 # --- CONFIGURATION ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 SONGS_DIR = os.path.join(BASE_DIR, 'songs-karaoke')
 JSON_PATH = os.path.join(BASE_DIR, 'songs.json')
+AUDIO_EXTENSIONS = frozenset({'.mp3', '.ogg', '.flac'})
+LOOKUP_WORKERS = 8
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+LRCLIB_SEARCH_URL = "https://lrclib.net/api/search"
+LRC_CACHE_PATH = os.path.join(BASE_DIR, '.lrc_cache.sqlite')
+LRC_NEGATIVE_TTL = 7 * 24 * 3600  # Seconds before a "no synced lyrics" answer is asked again
+HTTP_RETRIES = 3
+HTTP_BACKOFF = 0.3
+RETRY_STATUSES = (429, 502, 503, 504)
+
+# One keep-alive session for lrclib, Bandcamp and downloads, shared by the lookup workers
+SESSION = requests.Session()
+SESSION.headers['User-Agent'] = 'Mozilla/5.0'
+_ADAPTER = HTTPAdapter(pool_connections=LOOKUP_WORKERS, pool_maxsize=2 * LOOKUP_WORKERS,
+                       max_retries=Retry(total=HTTP_RETRIES, backoff_factor=HTTP_BACKOFF, status_forcelist=RETRY_STATUSES))
+SESSION.mount('https://', _ADAPTER)
+SESSION.mount('http://', _ADAPTER)
 
 # --- DEFAULT SONG DATA ---
 # Source: United States Marine Band (Public Domain) via Internet Archive
@@ -71,18 +98,28 @@ GENERIC_LYRICS = """[00:10.00] (Instrumental Intro)
 [00:25.00] Feel the rhythm!
 [00:30.00] Sing your heart out!"""
 
+TITLE_NOISE = ["backing track", "guitar", "bass", "drum", "vocal", "karaoke", "version", 
+               "instrumental", "cover", "tribute", "hq", "demo", "remastered", "with click", 
+               "lyrics", "(", ")", "[", "]"]
+# Longest first, so a phrase always wins over any shorter entry it starts with
+_TITLE_NOISE_RE = re.compile('|'.join(map(re.escape, sorted(TITLE_NOISE, key=len, reverse=True))))
+_FILENAME_TABLE = str.maketrans('', '', ''.join(c for c in map(chr, range(128)) if not re.match(r'[a-z0-9_]', c)))
+# Bandcamp fallback when there is no data-tralbum attribute. Runs on the raw bytes: each match
+# is one track object around its nested file object, with bounded brace-free gaps so it cannot
+# span two tracks. Bandcamp writes "file" before "title", so the title is looked for on both sides.
+_BC_TRACK_RE = re.compile(rb'\{([^{}]{0,3000})\{\s*"?mp3-128"?\s*:\s*"([^"]+)"[^{}]{0,500}\}([^{}]{0,3000})\}')
+_BC_TITLE_RE = re.compile(rb'\btitle"?\s*:\s*"([^"]{1,200})"')
+_LRC_RE = re.compile(r'^\[(\d{2}):(\d{2})\.(\d{2,3})\](.*)$', re.MULTILINE)
+
 def clean_filename(title):
-    s = title.lower().replace(' ', '_')
-    return re.sub(r'[^a-z0-9_]', '', s)
+    # Non-ASCII is dropped by the codec, the rest of [^a-z0-9_] by the table
+    s = title.lower().replace(' ', '_').encode('ascii', 'ignore').decode('ascii')
+    return s.translate(_FILENAME_TABLE)
 
 def clean_title(title, artist_arg=""):
     t = title.lower()
     if " - " in t: t = t.split(" - ")[0]
-    
-    remove_list = ["backing track", "guitar", "bass", "drum", "vocal", "karaoke", "version", 
-                   "instrumental", "cover", "tribute", "hq", "demo", "remastered", "with click", 
-                   "lyrics", "(", ")", "[", "]"]
-    for word in remove_list: t = t.replace(word, "")
+    t = _TITLE_NOISE_RE.sub("", t)
         
     if artist_arg:
         t = t.replace(artist_arg.lower(), "")
@@ -90,53 +127,138 @@ def clean_title(title, artist_arg=""):
             if len(part) > 3: t = t.replace(part.lower(), "")
     return " ".join(t.split()).title()
 
+def pick_synced_lyrics(data, duration):
+    # Closest duration among the tracks that have synced lyrics; ties keep lrclib's order
+    candidates = [t for t in data or () if t.get('syncedLyrics')]
+    if not candidates: return None
+    return min(candidates, key=lambda t: abs((t.get('duration') or 0) - duration))['syncedLyrics']
+
 def fetch_synced_lyrics(artist, song_title, duration):
-    print(f"      🔎 Lyrics: {artist} - {song_title} ...", end="")
-    search_url = "https://lrclib.net/api/search"
     params = {'artist_name': artist, 'track_name': song_title}
     
     try:
-        resp = requests.get(search_url, params=params, timeout=10)
+        resp = SESSION.get(LRCLIB_SEARCH_URL, params=params, timeout=10)
+        if resp.status_code != 200: return None
+        return pick_synced_lyrics(resp.json(), duration) or ""
+    except: return None
+
+async def _fetch_one(client, limit, artist, song_title, duration):
+    import asyncio
+    params = {'artist_name': artist, 'track_name': song_title}
+    try:
+        # The transport's retries only cover connection errors, so mirror SESSION's status retries here
+        for attempt in range(HTTP_RETRIES + 1):
+            async with limit:
+                resp = await client.get(LRCLIB_SEARCH_URL, params=params)
+            if resp.status_code not in RETRY_STATUSES or attempt == HTTP_RETRIES: break
+            retry_after = resp.headers.get('Retry-After', '')
+            await asyncio.sleep(float(retry_after) if retry_after.isdigit() else HTTP_BACKOFF * 2 ** attempt)
         if resp.status_code != 200: return None
-        data = resp.json()
-        if not data: return None
-        best_match = None
-        best_diff = 9999
-        for track in data:
-            if not track.get('syncedLyrics'): continue
-            diff = abs(track.get('duration', 0) - duration)
-            if diff < best_diff:
-                best_diff = diff
-                best_match = track
-        if best_match:
-            print(f" ✅ Found!")
-            return best_match['syncedLyrics']
-        return None
+        return pick_synced_lyrics(resp.json(), duration) or ""
     except: return None
 
+async def _fetch_all(queries):
+    # HTTP/2 multiplexes every search over one TLS connection; the semaphore keeps lrclib load polite
+    import asyncio
+    import httpx
+    limit = asyncio.Semaphore(LOOKUP_WORKERS)
+    transport = httpx.AsyncHTTPTransport(http2=True, retries=3,
+                                         limits=httpx.Limits(max_keepalive_connections=20, max_connections=50))
+    async with httpx.AsyncClient(transport=transport, timeout=10,
+                                 headers={'User-Agent': SESSION.headers['User-Agent']}) as client:
+        return await asyncio.gather(*(_fetch_one(client, limit, *q) for q in queries))
+
+def _search_all(queries):
+    if not queries: return []
+    if HTTPX_AVAILABLE:
+        import asyncio
+        return asyncio.run(_fetch_all(queries))
+    with ThreadPoolExecutor(max_workers=LOOKUP_WORKERS) as pool:
+        return list(pool.map(lambda q: fetch_synced_lyrics(*q), queries))
+
+def _lrc_cache_key(artist, song_title, duration):
+    return f"{artist}|{song_title}|{int(duration)}"
+
+def fetch_synced_lyrics_batch(queries):
+    # queries are (artist, song_title, duration); results come back in the same order.
+    # Searches return "" when lrclib has no synced lyrics and None when the lookup failed;
+    # only the former is cached, and only for LRC_NEGATIVE_TTL.
+    keys = [_lrc_cache_key(*q) for q in queries]
+    try:
+        db = sqlite3.connect(LRC_CACHE_PATH)
+        db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, lrc TEXT, ts INTEGER)")
+    except sqlite3.Error as e:
+        print(f"   ⚠️  Lyrics cache unavailable: {e}")
+        return _search_all(queries)
+    
+    with db:
+        cutoff = int(time.time()) - LRC_NEGATIVE_TTL
+        found = {}
+        for key in set(keys):
+            row = db.execute("SELECT lrc, ts FROM cache WHERE key = ?", (key,)).fetchone()
+            if row and (row[0] or row[1] >= cutoff): found[key] = row[0]
+        if found: print(f"   💾 Lyrics cache: {len(found)} of {len(set(keys))} lookups skipped")
+        
+        misses = {k: q for k, q in zip(keys, queries) if k not in found}
+        results = _search_all(list(misses.values()))
+        now = int(time.time())
+        db.executemany("INSERT OR REPLACE INTO cache (key, lrc, ts) VALUES (?, ?, ?)",
+                       [(k, lrc, now) for k, lrc in zip(misses, results) if lrc is not None])
+        found.update(zip(misses, results))
+    db.close()
+    return [found[k] for k in keys]
+
 def parse_lrc(lrc_text):
-    lines = []
-    regex = re.compile(r'\[(\d{2}):(\d{2})\.(\d{2,3})\](.*)')
-    for line in lrc_text.split('\n'):
-        match = regex.match(line)
-        if match:
-            ts = (int(match.group(1)) * 60) + int(match.group(2)) + float(f"0.{match.group(3)}")
-            text = match.group(4).strip()
-            if text: lines.append({"time": ts, "text": text})
-    return lines
+    # Centiseconds or milliseconds: scale by the digit count instead of re-parsing a float string
+    return [{"time": (int(mm) * 60) + int(ss) + int(frac) / 10 ** len(frac), "text": text.strip()}
+            for mm, ss, frac, text in _LRC_RE.findall(lrc_text) if text.strip()]
 
 def calculate_word_weights(words):
-    weights = []
-    total_weight = 0
-    for word in words:
-        length = len(word)
-        weight = length
-        if length <= 2: weight *= 0.6 
-        elif length <= 4: weight *= 0.9
-        elif length >= 8: weight *= 1.2
-        weights.append(weight)
-        total_weight += weight
-    return weights, total_weight
+    lens = np.fromiter((len(w) for w in words), dtype=np.int32, count=len(words))
+    weights = lens * np.where(lens <= 2, 0.6, np.where(lens <= 4, 0.9, np.where(lens >= 8, 1.2, 1.0)))
+    return weights, float(weights.sum())
+
+# Same weighting as calculate_word_weights, fused with the cursor walk into one native loop
+def _word_times_kernel(lengths, start, line_duration):
+    n = lengths.shape[0]
+    weights = np.empty(n)
+    total = 0.0
+    for i in range(n):
+        length = lengths[i]
+        if length <= 2: weights[i] = length * 0.6
+        elif length <= 4: weights[i] = length * 0.9
+        elif length >= 8: weights[i] = length * 1.2
+        else: weights[i] = length
+        total += weights[i]
+    unit = line_duration / (total if total != 0 else 1.0)
+    cursor = np.empty(n + 1)
+    cursor[0] = start
+    for i in range(n):
+        cursor[i + 1] = cursor[i] + weights[i] * unit
+    return cursor
+
+@functools.cache
+def _word_times():
+    # Compiled on first use; cache=True keeps the machine code in __pycache__ between runs
+    # find_spec only says numba is installed; a broken install (e.g. numpy too new) fails here
+    try: from numba import njit
+    except ImportError: return None
+    return njit(cache=True)(_word_times_kernel)
+
+def word_timings(words, start_time, line_duration):
+    # cursor[i] is word i's start and cursor[i + 1] its end
+    kernel = _word_times() if NUMBA_AVAILABLE else None
+    if kernel:
+        lens = np.fromiter((len(w) for w in words), dtype=np.int32, count=len(words))
+        cursor = kernel(lens, float(start_time), float(line_duration))
+    else:
+        # A cumsum seeded with start_time accumulates in the same order as a running cursor
+        weights, total_weight = calculate_word_weights(words)
+        if total_weight == 0: total_weight = 1
+        cursor = np.cumsum(np.concatenate(([start_time], weights * (line_duration / total_weight))))
+    # round() rather than np.round, which is not correctly rounded at 0.005 ties
+    bounds = [round(t, 2) for t in cursor.tolist()]
+    return [{"text": w, "start": b, "end": e} for w, b, e in zip(words, bounds, bounds[1:])], float(cursor[-1])
 
 def generate_lyrics_map(lrc_text, duration=None):
     parsed_lines = parse_lrc(lrc_text)
@@ -162,21 +284,7 @@ def generate_lyrics_map(lrc_text, duration=None):
         
         estimated_needed_time = len(text) * 0.15 
         line_duration = min(time_gap, estimated_needed_time + 1.0)
-        word_weights, total_weight = calculate_word_weights(words)
-        if total_weight == 0: total_weight = 1
-        time_per_weight_unit = line_duration / total_weight
-        
-        line_words_data = []
-        word_cursor = start_time
-        
-        for idx, word in enumerate(words):
-            w_dur = word_weights[idx] * time_per_weight_unit
-            line_words_data.append({
-                "text": word,
-                "start": round(word_cursor, 2),
-                "end": round(word_cursor + w_dur, 2)
-            })
-            word_cursor += w_dur
+        line_words_data, _ = word_timings(words, start_time, line_duration)
 
         lyrics_map.append({
             "time": round(start_time, 2),
@@ -200,20 +308,7 @@ def generate_heuristic_map(text_block, duration):
     
     for line in lines:
         words = line.split()
-        line_words_data = []
-        word_cursor = current_time
-        word_weights, total_weight = calculate_word_weights(words)
-        if total_weight == 0: total_weight = 1
-        time_per_unit = (avg_line_dur - LINE_GAP) / total_weight
-        
-        for idx, word in enumerate(words):
-            w_dur = word_weights[idx] * time_per_unit
-            line_words_data.append({
-                "text": word,
-                "start": round(word_cursor, 2),
-                "end": round(word_cursor + w_dur, 2)
-            })
-            word_cursor += w_dur
+        line_words_data, word_cursor = word_timings(words, current_time, avg_line_dur - LINE_GAP)
             
         lyrics_map.append({
             "time": round(current_time, 2),
@@ -226,11 +321,11 @@ def generate_heuristic_map(text_block, duration):
 
 def scrape_bandcamp(url):
     print(f"   🔎 Connecting to Bandcamp...")
-    headers = {'User-Agent': 'Mozilla/5.0'}
     try:
-        resp = requests.get(url, headers=headers, timeout=15)
+        resp = SESSION.get(url, timeout=15)
         if resp.status_code != 200: return []
         html = resp.text
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html, 'html.parser')
         track_list = []
         tags = soup.find_all(attrs={"data-tralbum": True})
@@ -243,9 +338,11 @@ def scrape_bandcamp(url):
             except: pass
         
         if not track_list:
-            matches = re.finditer(r'title"?\s*:\s*"(.*?)".*?"?mp3-128"?\s*:\s*"(.*?)"', html, re.DOTALL)
-            for m in matches:
-                track_list.append({'title': m.group(1), 'file': {'mp3-128': m.group(2)}, 'duration': 180})
+            for before, stream_url, after in _BC_TRACK_RE.findall(resp.content):
+                title = _BC_TITLE_RE.search(before) or _BC_TITLE_RE.search(after)
+                if not title: continue
+                track_list.append({'title': title[1].decode('utf-8', 'replace'),
+                                   'file': {'mp3-128': stream_url.decode('utf-8', 'replace')}, 'duration': 180})
         
         processed = []
         for track in track_list:
@@ -274,49 +371,111 @@ def download_file(url, filepath, force=False):
         print(f"      ⬇️ Downloading...", end="")
         
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        with requests.get(url, stream=True, headers=headers, timeout=30) as r:
+        with SESSION.get(url, stream=True, timeout=30) as r:
             r.raise_for_status()
-            with open(filepath, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192): f.write(chunk)
+            r.raw.decode_content = True
+            with open(filepath, 'wb') as f: shutil.copyfileobj(r.raw, f, length=DOWNLOAD_CHUNK_SIZE)
         print(" ✅")
         return True
     except Exception as e:
         print(f" ❌ Failed: {e}")
         return False
 
-def get_audio_duration(filepath):
+# (artist keys, title keys) per Mutagen type; Vorbis-style names cover Ogg, FLAC and the rest,
+# with the ID3 frames as a fallback for other containers that carry an ID3 tag
+_TAG_KEYS = {MP3: (('TPE1',), ('TIT2',))}
+_DEFAULT_TAG_KEYS = (('artist', 'TPE1'), ('title', 'TIT2'))
+
+def _tag(audio, *keys):
+    for key in keys:
+        values = audio.get(key)
+        if values: return values[0]
+    return None
+
+# MPEG audio Layer III header tables, indexed by the header's bit fields
+_MP3_BITRATES = {True: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+                 False: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)}
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+def _fast_mp3_duration(fh):
+    # Duration from the first frame header after the ID3v2 tag: exact when the frame is a
+    # Xing/Info header with a frame count, else a CBR size/bitrate estimate. None when the
+    # header is not Layer III, so the caller can fall back to Mutagen's full scan.
+    head = fh.read(10)
+    start = 0
+    if head[:3] == b'ID3' and len(head) == 10:
+        start = 10 + ((head[6] & 0x7f) << 21 | (head[7] & 0x7f) << 14 | (head[8] & 0x7f) << 7 | (head[9] & 0x7f))
+        if head[5] & 0x10: start += 10  # Footer present
+    fh.seek(start)
+    frame = fh.read(64)
+    if len(frame) < 4 or frame[0] != 0xFF or (frame[1] & 0xE0) != 0xE0: return None
+    version, layer = (frame[1] >> 3) & 3, (frame[1] >> 1) & 3
+    bitrate_idx, rate_idx = frame[2] >> 4, (frame[2] >> 2) & 3
+    if version == 1 or layer != 1 or bitrate_idx in (0, 15) or rate_idx == 3: return None
+    mpeg1 = version == 3
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_idx]
+    mono = (frame[3] >> 6) == 3
+    xing = 4 + ((17 if mono else 32) if mpeg1 else (9 if mono else 17))
+    if frame[xing:xing + 4] in (b'Xing', b'Info') and len(frame) >= xing + 12 and frame[xing + 7] & 1:
+        frames = int.from_bytes(frame[xing + 8:xing + 12], 'big')
+        return frames * (1152 if mpeg1 else 576) / sample_rate
+    return (os.fstat(fh.fileno()).st_size - start) * 8 / (_MP3_BITRATES[mpeg1][bitrate_idx] * 1000)
+
+def get_audio_info(filepath):
+    # One open for duration and tags: (duration, artist, title)
     try:
-        audio = MutagenFile(filepath)
-        if audio and hasattr(audio.info, 'length'): return float(audio.info.length)
-    except: pass
-    return 180.0
+        # Mutagen seeks around in small reads; an explicit 4 KiB buffer is much faster on NFS/SMB
+        with open(filepath, 'rb', buffering=4096) as fh:
+            if filepath.lower().endswith('.mp3'):
+                duration = _fast_mp3_duration(fh)
+                if duration is not None:
+                    fh.seek(0)
+                    try: tags = ID3(fh)
+                    except ID3NoHeaderError: tags = {}
+                    artist_keys, title_keys = _TAG_KEYS[MP3]
+                    return duration, _tag(tags, *artist_keys), _tag(tags, *title_keys)
+                fh.seek(0)
+            audio = MutagenFile(fh)
+        if audio is None: return 180.0, None, None
+        duration = float(getattr(audio.info, 'length', 180.0))
+        artist_keys, title_keys = _TAG_KEYS.get(type(audio), _DEFAULT_TAG_KEYS)
+        return duration, _tag(audio, *artist_keys), _tag(audio, *title_keys)
+    except: return 180.0, None, None
+
+FICLONE = 0x40049409  # linux/fs.h: share the source's extents copy-on-write (btrfs, XFS)
 
-def get_audio_metadata(filepath):
+def place_file(source_path, dest_path, hardlink=False):
+    # Cheapest way to get the audio into SONGS_DIR: an opt-in hardlink (the song then
+    # shares the source's inode), a reflink, or copyfile, which still takes the kernel
+    # copy path (sendfile on Linux, fcopyfile on macOS) without copystat.
+    # Everything lands on a temporary name first: dest_path may be the source's own inode
+    # from an earlier --hardlink run, and opening it for writing would truncate the original.
+    tmp = dest_path + '.tmp'
     try:
-        audio = MutagenFile(filepath)
-        if audio is None: return None, None
-        artist = None
-        title = None
-        if isinstance(audio, MP3):
-            artist = audio.get('TPE1', [None])[0] if 'TPE1' in audio else None
-            title = audio.get('TIT2', [None])[0] if 'TIT2' in audio else None
-        elif isinstance(audio, (OggVorbis, FLAC)):
-            artist = audio.get('artist', [None])[0] if 'artist' in audio else None
-            title = audio.get('title', [None])[0] if 'title' in audio else None
-        else:
-            artist = audio.get('artist', [None])[0] if 'artist' in audio else None
-            title = audio.get('title', [None])[0] if 'title' in audio else None
-        return artist, title
-    except: return None, None
-
-def copy_file_to_songs(source_path, dest_filename):
+        if hardlink:
+            try:
+                os.link(source_path, tmp)
+                os.replace(tmp, dest_path)
+                return
+            except OSError: pass  # Cross-device or unsupported
+        if sys.platform.startswith('linux'):
+            try:
+                with open(source_path, 'rb') as src, open(tmp, 'wb') as dst:
+                    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                os.replace(tmp, dest_path)
+                return
+            except OSError: pass
+        shutil.copyfile(source_path, tmp)
+        os.replace(tmp, dest_path)
+    finally:
+        if os.path.lexists(tmp): os.remove(tmp)
+
+def copy_file_to_songs(source_path, dest_filename, hardlink=False):
     dest_path = os.path.join(SONGS_DIR, dest_filename)
     if source_path.lower().endswith('.mp3'):
         print(f"      📂 Copying file...", end="")
         try:
-            import shutil
-            shutil.copy2(source_path, dest_path)
+            place_file(source_path, dest_path, hardlink)
             print(" ✅")
             return True
         except: 
@@ -326,41 +485,49 @@ def copy_file_to_songs(source_path, dest_filename):
         dest_path = dest_path.replace('.mp3', ext)
         print(f"      📂 Copying {ext} file...", end="")
         try:
-            import shutil
-            shutil.copy2(source_path, dest_path)
+            place_file(source_path, dest_path, hardlink)
             print(" ✅")
             return dest_path
         except:
             print(" ❌"); return False
 
-def process_local_files(directory, artist_name, album_name=None):
+# Tag reads and title cleanup for one file, run on the lookup pool
+def _probe_file(audio_path, artist_name):
+    filename = os.path.basename(audio_path)
+    duration, meta_artist, meta_title = get_audio_info(audio_path)
+    
+    title = meta_title if meta_title else os.path.splitext(filename)[0].replace('_', ' ').replace('-', ' ')
+    artist = meta_artist if meta_artist else (artist_name if artist_name else "Unknown Artist")
+    clean_name = clean_title(title, artist_arg=artist)
+    return duration, artist, clean_name
+
+def process_local_files(directory, artist_name, album_name=None, hardlink=False):
     print(f"\n🎤 Processing local files from: {directory}")
-    audio_files = []
-    for ext in ['*.mp3', '*.ogg', '*.flac']:
-        audio_files.extend(glob.glob(os.path.join(directory, ext)))
-        audio_files.extend(glob.glob(os.path.join(directory, ext.upper())))
+    # One readdir pass; dotfiles (e.g. macOS ._ resource forks) are skipped as glob did
+    with os.scandir(directory) as entries:
+        audio_files = sorted(e.path for e in entries
+                             if not e.name.startswith('.') and e.is_file()
+                             and os.path.splitext(e.name)[1].lower() in AUDIO_EXTENSIONS)
     
     if not audio_files: return {}
     json_entries = {}
     
-    for audio_path in sorted(audio_files):
-        filename = os.path.basename(audio_path)
-        print(f"\n   🎤 Processing: {filename}")
-        duration = get_audio_duration(audio_path)
-        meta_artist, meta_title = get_audio_metadata(audio_path)
-        
-        title = meta_title if meta_title else os.path.splitext(filename)[0].replace('_', ' ').replace('-', ' ')
-        artist = meta_artist if meta_artist else (artist_name if artist_name else "Unknown Artist")
-        clean_name = clean_title(title, artist_arg=artist)
+    with ThreadPoolExecutor(max_workers=LOOKUP_WORKERS) as pool:
+        probes = list(pool.map(_probe_file, audio_files, [artist_name] * len(audio_files)))
+    # All lyric searches go out together; results are consumed in order so the output stays readable
+    lyrics = fetch_synced_lyrics_batch([(artist, clean_name, duration) for duration, artist, clean_name in probes])
+    
+    for audio_path, (duration, artist, clean_name), lrc in zip(audio_files, probes, lyrics):
+        print(f"\n   🎤 Processing: {os.path.basename(audio_path)}")
         print(f"      📝 Title: {clean_name}")
         
         file_id = clean_filename(clean_name)
         dest_filename = f"{file_id}.mp3"
-        copied_path = copy_file_to_songs(audio_path, dest_filename)
+        copied_path = copy_file_to_songs(audio_path, dest_filename, hardlink)
         
         if copied_path:
             if copied_path != True: dest_filename = os.path.basename(copied_path)
-            lrc = fetch_synced_lyrics(artist, clean_name, duration)
+            print(f"      🔎 Lyrics: {artist} - {clean_name} ...{' ✅ Found!' if lrc else ''}")
             if lrc:
                 clean_lyrics, lyrics_map, intro_offset = generate_lyrics_map(lrc)
             else:
@@ -384,6 +551,8 @@ def main():
     parser.add_argument('--mixtape', metavar='FILE', help='CSV file')
     parser.add_argument('--artist', metavar='NAME', help='Artist name')
     parser.add_argument('--album', metavar='NAME', help='Album name')
+    parser.add_argument('--hardlink', action='store_true',
+                        help='Hardlink local files into songs-karaoke instead of copying (same filesystem only)')
     parser.add_argument('legacy_args', nargs='*', help=argparse.SUPPRESS)
     args = parser.parse_args()
     
@@ -392,7 +561,9 @@ def main():
     # Load DB
     if os.path.exists(JSON_PATH):
         try:
-            with open(JSON_PATH, 'r', encoding='utf-8') as f: json_db = json.load(f)
+            # orjson decodes straight from the mapping, with no read() copy of the file
+            with open(JSON_PATH, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view: json_db = orjson.loads(view)
         except: json_db = {}
     else: json_db = {}
     
@@ -414,11 +585,14 @@ def main():
 
     # Process args (omitted for brevity in fix, but logic remains same)
     if args.files:
-         entries = process_local_files(args.files, args.artist, args.album)
+         entries = process_local_files(args.files, args.artist, args.album, args.hardlink)
          json_db.update(entries)
 
-    with open(JSON_PATH, 'w', encoding='utf-8') as f:
-        json.dump(json_db, f, indent=2)
+    # Write beside the live file and swap it in, so the running app never reads a partial DB
+    tmp_path = JSON_PATH + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(orjson.dumps(json_db, option=orjson.OPT_INDENT_2))
+    os.replace(tmp_path, JSON_PATH)
         
     print(f"\n✅ Setup Complete! {len(json_db)} songs available.")
 
@@ -4,7 +4,7 @@
 # Function to stop the server
 stop_server() {
     echo "🛑 Stopping Chirp 3 Demo..."
-    pkill -f "python.*main.py" 2>/dev/null
+    pkill -f "gunicorn.*wsgi:app" 2>/dev/null
     exit 0
 }
 
@@ -88,9 +88,9 @@ done
 # 6. Check Port & Run
 if lsof -Pi :$PORT -sTCP:LISTEN -t >/dev/null 2>&1; then
     echo "⚠️  Port $PORT in use. Killing old process..."
-    pkill -f "python.*main.py" 2>/dev/null
+    pkill -f "gunicorn.*wsgi:app" 2>/dev/null
     sleep 1
 fi
 
 echo "🎵 Starting server on port $PORT..."
-"$VENV_DIR/bin/python" main.py $PORT
\ No newline at end of file
+"$VENV_DIR/bin/gunicorn" --bind "0.0.0.0:$PORT" --workers 4 --worker-class gthread --threads 8 --timeout 120 wsgi:app
\ No newline at end of file
@@ -0,0 +1,7 @@
+# Filename: wsgi.py
+# WSGI entry point for production servers, e.g.:
+#   gunicorn -w 4 -k gthread --threads 8 --timeout 120 wsgi:app
+from main import app
+
+if __name__ == '__main__':
+    app.run()